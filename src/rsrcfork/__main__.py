@@ -1,8 +1,12 @@
 import argparse
+import codecs
 import enum
+import functools
 import io
 import itertools
-import shutil
+import operator
+import os
+import re
 import sys
 import typing
 
@@ -25,10 +29,14 @@ _REZ_ATTR_NAMES = {
 F = typing.TypeVar("F", bound=enum.Flag)
 
 
+@functools.lru_cache(maxsize=None)
 def decompose_flags(value: F) -> typing.Sequence[F]:
-	"""Decompose an enum.Flags instance into separate enum constants."""
+	"""Decompose an enum.Flags instance into separate enum constants.
 	
-	return [bit for bit in type(value) if bit in value]
+	The results are cached, because this is called for every resource that is listed or output, but resource attributes can only have a small number of distinct values.
+	"""
+	
+	return tuple(bit for bit in type(value) if bit in value)
 
 
 def join_flag_names(flags: typing.Iterable[F], sep: str = " | ") -> str:
@@ -59,6 +67,29 @@ def is_printable(char: str) -> bool:
 # Translation table to replace non-printable characters with periods.
 _TRANSLATE_NONPRINTABLES = {ord(c): "." for c in bytes(range(256)).decode(_TEXT_ENCODING) if not is_printable(c)}
 
+# Charmap decoding table that decodes bytes using _TEXT_ENCODING and replaces non-printable characters with periods in a single step.
+_DECODING_TABLE_PRINTABLE = bytes(range(256)).decode(_TEXT_ENCODING).translate(_TRANSLATE_NONPRINTABLES)
+
+# Two-digit lowercase hex representations of all byte values, for formatting hex dumps without calling format once per byte.
+_HEX_BYTES = [f"{byte:02x}" for byte in range(256)]
+
+
+def decode_printable(data: bytes) -> str:
+	"""Decode a bytestring using _TEXT_ENCODING and replace all non-printable characters with periods."""
+	
+	return codecs.charmap_decode(data, "strict", _DECODING_TABLE_PRINTABLE)[0]
+
+
+def hex_bytes(data: bytes) -> str:
+	"""Convert a bytestring to space-separated two-digit lowercase hex numbers."""
+	
+	return " ".join(map(_HEX_BYTES.__getitem__, data))
+
+
+# Matches a single complete escape sequence as understood by bytes_unescape.
+# An incomplete escape sequence at the end of the string (a lone backslash, or a hex escape with fewer than two digits) does not match.
+_ESCAPE_SEQUENCE_RE = re.compile(r"\\(?:x(?P<hex>..)|(?P<char>[^x]))", re.DOTALL)
+
 
 def bytes_unescape(string: str) -> bytes:
 	"""Convert a string containing text (in _TEXT_ENCODING) and hex escapes to a bytestring.
@@ -66,43 +97,58 @@ def bytes_unescape(string: str) -> bytes:
 	(We implement our own unescaping mechanism here to not depend on any of Python's string/bytes escape syntax.)
 	"""
 	
-	out: typing.List[int] = []
-	it = iter(string)
-	for char in it:
-		if char == "\\":
-			try:
-				esc = next(it)
-				if esc in "\\\'\"":
-					out.extend(esc.encode(_TEXT_ENCODING))
-				elif esc == "x":
-					x1, x2 = next(it), next(it)
-					out.append(int(x1+x2, 16))
-				else:
-					raise ValueError(f"Unknown escape character: {esc}")
-			except StopIteration:
-				raise ValueError("End of string in escape sequence")
+	if "\\" not in string:
+		# Fast path for the common case of strings without any escapes, which can be encoded in one go.
+		return string.encode(_TEXT_ENCODING)
+	
+	out = bytearray()
+	pos = 0
+	for match in _ESCAPE_SEQUENCE_RE.finditer(string):
+		# Everything between two escape sequences is literal text and can be encoded in one go.
+		out += string[pos:match.start()].encode(_TEXT_ENCODING)
+		
+		esc = match.group("char")
+		if esc is None:
+			out.append(int(match.group("hex"), 16))
+		elif esc in "\\\'\"":
+			out += esc.encode(_TEXT_ENCODING)
 		else:
-			out.extend(char.encode(_TEXT_ENCODING))
+			raise ValueError(f"Unknown escape character: {esc}")
+		
+		pos = match.end()
+	
+	rest = string[pos:]
+	if "\\" in rest:
+		# The only way for a backslash to not be part of a matched escape sequence is if the string ends in the middle of the escape sequence.
+		raise ValueError("End of string in escape sequence")
+	out += rest.encode(_TEXT_ENCODING)
 	
 	return bytes(out)
 
 
+@functools.lru_cache(maxsize=None)
+def _escape_table(quote: typing.Optional[str]) -> typing.Dict[int, str]:
+	"""Build a charmap decoding table that maps all byte values to their escaped representations, as used by bytes_escape with the given quote character."""
+	
+	table: typing.Dict[int, str] = {}
+	for byte, char in enumerate(bytes(range(256)).decode(_TEXT_ENCODING)):
+		if char in {quote, "\\"}:
+			table[byte] = f"\\{char}"
+		elif is_printable(char):
+			table[byte] = char
+		else:
+			table[byte] = f"\\x{byte:02x}"
+	return table
+
+
 def bytes_escape(bs: bytes, *, quote: typing.Optional[str] = None) -> str:
 	"""Convert a bytestring to a string (using _TEXT_ENCODING), with non-printable characters hex-escaped.
 	
 	(We implement our own escaping mechanism here to not depend on Python's str or bytes repr.)
 	"""
 	
-	out = []
-	for byte, char in zip(bs, bs.decode(_TEXT_ENCODING)):
-		if char in {quote, "\\"}:
-			out.append(f"\\{char}")
-		elif is_printable(char):
-			out.append(char)
-		else:
-			out.append(f"\\x{byte:02x}")
-	
-	return "".join(out)
+	# The escaped representations can be longer than one character, which is supported by charmap decoding with a dict (but not with a str) as the decoding table.
+	return codecs.charmap_decode(bs, "strict", _escape_table(quote))[0]
 
 
 def bytes_quote(bs: bytes, quote: str) -> str:
@@ -114,10 +160,62 @@ def bytes_quote(bs: bytes, quote: str) -> str:
 	return quote + bytes_escape(bs, quote=quote) + quote
 
 
+@functools.lru_cache(maxsize=None)
+def _quote_restype(restype: bytes) -> str:
+	"""Convert a resource type code to a single-quoted string, like bytes_quote.
+	
+	Files usually contain many resources with the same type code, so the results are cached. (Resource names are not cached the same way, because they are mostly unique.)
+	"""
+	
+	return bytes_quote(restype, "'")
+
+
 MIN_RESOURCE_ID = -0x8000
 MAX_RESOURCE_ID = 0x7fff
 
 
+# Matches all forms of resource filters, except for unquoted four-character type codes.
+# The resource type may contain escaped single quotes. The resource name can contain any characters, and extends up to the last double quote before the closing parenthesis.
+# The resource ID and range bounds are only split apart here and not validated - they are converted using int, so they may contain anything that int accepts (surrounding whitespace, underscores, etc.).
+_RESOURCE_FILTER_RE = re.compile(r"""
+	'(?P<type>(?:[^'\\]|\\.)*)'
+	(?:
+		[ ]\(
+			(?:
+				"(?P<name>.*)"
+				|(?P<start>[^:]*):(?P<end>[^:]*)
+				|(?P<id>[^:]*)
+			)
+		\)
+	)?
+""", re.VERBOSE | re.DOTALL)
+
+# Matches only the quoted resource type at the start of a resource filter. Used to give more specific error messages for invalid filters.
+_RESOURCE_FILTER_TYPE_RE = re.compile(r"'(?:[^'\\]|\\.)*'", re.DOTALL)
+
+
+def _diagnose_invalid_filter(filter: str) -> str:
+	"""Describe what is wrong with a resource filter that doesn't match _RESOURCE_FILTER_RE."""
+	
+	type_match = _RESOURCE_FILTER_TYPE_RE.match(filter)
+	if type_match is None:
+		return "Resource type must be single-quoted"
+	
+	rest = filter[type_match.end():]
+	if not rest.startswith(" "):
+		return "Resource type and ID must be separated by a space"
+	
+	resid_str = rest[1:]
+	if not (resid_str.startswith("(") and resid_str.endswith(")")):
+		return "Resource ID must be parenthesized"
+	
+	resid_str = resid_str[1:-1]
+	if resid_str.count(":") > 1:
+		return f"Too many colons in ID range expression: {resid_str!r}"
+	else:
+		return f"Resource ID must be an integer, an integer range, or a double-quoted name: {resid_str!r}"
+
+
 class ResourceFilter(object):
 	type: bytes
 	min_id: int
@@ -129,39 +227,33 @@ class ResourceFilter(object):
 		if len(filter) == 4:
 			restype = filter.encode("ascii")
 			return cls(restype, MIN_RESOURCE_ID, MAX_RESOURCE_ID, None)
-		elif filter[0] == filter[-1] == "'":
+		elif len(filter) >= 2 and filter[0] == filter[-1] == "'":
+			# A filter consisting only of a quoted type is taken as-is, so the type may also contain unescaped single quotes.
 			restype = bytes_unescape(filter[1:-1])
 			return cls(restype, MIN_RESOURCE_ID, MAX_RESOURCE_ID, None)
-		else:
-			pos = filter.find("'", 1)
-			if pos == -1:
-				raise ValueError(f"Invalid filter {filter!r}: Resource type must be single-quoted")
-			elif filter[pos + 1] != " ":
-				raise ValueError(f"Invalid filter {filter!r}: Resource type and ID must be separated by a space")
-			
-			restype_str, resid_str = filter[:pos + 1], filter[pos + 2:]
-			
-			if not restype_str[0] == restype_str[-1] == "'":
-				raise ValueError(
-					f"Invalid filter {filter!r}: Resource type is not a single-quoted type identifier: {restype_str!r}")
-			restype = bytes_unescape(restype_str[1:-1])
-			
-			if resid_str[0] != "(" or resid_str[-1] != ")":
-				raise ValueError(f"Invalid filter {filter!r}: Resource ID must be parenthesized")
-			resid_str = resid_str[1:-1]
-			
-			if resid_str[0] == resid_str[-1] == '"':
-				name = bytes_unescape(resid_str[1:-1])
-				return cls(restype, MIN_RESOURCE_ID, MAX_RESOURCE_ID, name)
-			elif ":" in resid_str:
-				if resid_str.count(":") > 1:
-					raise ValueError(f"Invalid filter {filter!r}: Too many colons in ID range expression: {resid_str!r}")
-				start_str, end_str = resid_str.split(":")
-				start, end = int(start_str), int(end_str)
-				return cls(restype, start, end, None)
+		
+		match = _RESOURCE_FILTER_RE.fullmatch(filter)
+		if match is None:
+			raise ValueError(f"Invalid filter {filter!r}: {_diagnose_invalid_filter(filter)}")
+		
+		restype = bytes_unescape(match.group("type"))
+		name = match.group("name")
+		if name is not None:
+			return cls(restype, MIN_RESOURCE_ID, MAX_RESOURCE_ID, bytes_unescape(name))
+		
+		resid = match.group("id")
+		start = match.group("start")
+		try:
+			if start is not None:
+				min_id, max_id = int(start), int(match.group("end"))
+			elif resid is not None:
+				min_id = max_id = int(resid)
 			else:
-				resid = int(resid_str)
-				return cls(restype, resid, resid, None)
+				min_id, max_id = MIN_RESOURCE_ID, MAX_RESOURCE_ID
+		except ValueError:
+			raise ValueError(f"Invalid filter {filter!r}: {_diagnose_invalid_filter(filter)}") from None
+		
+		return cls(restype, min_id, max_id, None)
 	
 	def __init__(self, restype: bytes, min_id: int, max_id: int, name: typing.Optional[bytes]) -> None:
 		super().__init__()
@@ -190,15 +282,38 @@ class ResourceFilter(object):
 def filter_resources(rf: api.ResourceFile, filters: typing.Sequence[str]) -> typing.Iterable[api.Resource]:
 	if not filters:
 		# Special case: an empty list of filters matches all resources rather than none
-		for reses in rf.values():
-			yield from reses.values()
+		yield from itertools.chain.from_iterable(reses.values() for reses in rf.values())
 	else:
-		filter_objs = [ResourceFilter.from_string(filter) for filter in filters]
+		filter_objs_by_type: typing.Dict[bytes, typing.List[ResourceFilter]] = {}
+		# Filters that are given more than once are only parsed and checked once, and don't cause redundant lookups later. dict.fromkeys is used instead of a set to keep the filters in order, so that errors are still reported for the first invalid filter.
+		for filter_str in dict.fromkeys(filters):
+			filter_obj = ResourceFilter.from_string(filter_str)
+			filter_objs_by_type.setdefault(filter_obj.type, []).append(filter_obj)
 		
-		for reses in rf.values():
-			for res in reses.values():
-				if any(filter_obj.matches(res) for filter_obj in filter_objs):
-					yield res
+		for restype in rf:
+			try:
+				type_filter_objs = filter_objs_by_type[restype]
+			except KeyError:
+				# None of the filters can match resources of this type, so there's no need to look at them at all.
+				continue
+			
+			reses = rf[restype]
+			matching_ids: typing.Set[int] = set()
+			for filter_obj in type_filter_objs:
+				if filter_obj.name is not None:
+					# Look up the name in the resource file's name index, so that only the names need to be read once per type, instead of checking every resource against every name filter.
+					candidate_ids: typing.Iterable[int] = rf._resource_ids_by_name(restype).get(filter_obj.name, ())
+				elif filter_obj.max_id - filter_obj.min_id < len(reses):
+					# If the ID range is small (most commonly a single ID), look up the IDs in the range directly instead of checking every resource of this type.
+					candidate_ids = (resid for resid in range(filter_obj.min_id, filter_obj.max_id + 1) if resid in reses)
+				else:
+					candidate_ids = reses
+				matching_ids.update(resid for resid in candidate_ids if filter_obj.min_id <= resid <= filter_obj.max_id)
+			
+			# Output the matching resources in the order in which they appear in the file.
+			# Only the matching IDs are looked up, so that no Resource objects are created for resources that are filtered out.
+			# Both the filtering and the lookups are done using builtins, so that there's no Python-level loop body that has to run for every resource.
+			yield from map(reses.__getitem__, filter(matching_ids.__contains__, reses))
 
 
 def hexdump_stream(stream: typing.BinaryIO) -> typing.Iterable[str]:
@@ -214,9 +329,12 @@ def hexdump_stream(stream: typing.BinaryIO) -> typing.Iterable[str]:
 				yield "*"
 				asterisk_shown = True
 		else:
-			line_hex_left = " ".join(f"{byte:02x}" for byte in line[:8])
-			line_hex_right = " ".join(f"{byte:02x}" for byte in line[8:])
-			line_char = line.decode(_TEXT_ENCODING).translate(_TRANSLATE_NONPRINTABLES)
+			# Hex-encode the whole line at once and split it into the two halves afterwards.
+			# Each byte takes up three characters (two hex digits and a space), so the left half is the first 8*3-1 characters, followed by a single space that separates the halves.
+			line_hex = hex_bytes(line)
+			line_hex_left = line_hex[:8*3-1]
+			line_hex_right = line_hex[8*3:]
+			line_char = decode_printable(line)
 			yield f"{i:08x}  {line_hex_left:<{8*2+7}}  {line_hex_right:<{8*2+7}}  |{line_char}|"
 			asterisk_shown = False
 		last_line = line
@@ -232,16 +350,38 @@ def hexdump(data: bytes) -> typing.Iterable[str]:
 
 
 def raw_hexdump_stream(stream: typing.BinaryIO) -> typing.Iterable[str]:
-	line = stream.read(16)
-	while line:
-		yield " ".join(f"{byte:02x}" for byte in line)
-		line = stream.read(16)
+	# Read and format the lines using only builtins (iter with a sentinel, and map), so that no Python code needs to run for each line.
+	return map(hex_bytes, iter(functools.partial(stream.read, 16), b""))
 
 
 def raw_hexdump(data: bytes) -> typing.Iterable[str]:
 	yield from raw_hexdump_stream(io.BytesIO(data))
 
 
+def derez_data_stream(stream: typing.BinaryIO) -> typing.Iterable[str]:
+	bytes_line = stream.read(16)
+	while bytes_line:
+		# Two-byte grouping: hex-encode the whole line at once and split it into groups of four hex digits.
+		# If the line has an odd length, the last group automatically ends up with only two hex digits.
+		# (bytes.hex can insert separators by itself, but only since Python 3.8.)
+		line_hex = bytes_line.hex().upper()
+		groups = " ".join([line_hex[j:j+4] for j in range(0, len(line_hex), 4)])
+		
+		s = f'$"{groups}"'
+		comment = "/* " + decode_printable(bytes_line) + " */"
+		yield f"\t{s:<54s}{comment}"
+		bytes_line = stream.read(16)
+
+
+def write_lines(lines: typing.Iterable[str]) -> None:
+	"""Write each of the given lines to stdout, followed by a newline.
+	
+	This has the same result as calling print on each line, but is noticeably faster when writing large hex dumps and similar output with lots of short lines.
+	"""
+	
+	sys.stdout.writelines(f"{line}\n" for line in lines)
+
+
 def translate_text(data: bytes) -> str:
 	return data.decode(_TEXT_ENCODING).replace("\r", "\n")
 
@@ -256,19 +396,20 @@ def describe_resource(res: api.Resource, *, include_type: bool, decompress: bool
 	
 	content_desc_parts = []
 	
-	if decompress and api.ResourceAttrs.resCompressed in res.attributes:
+	attributes = res.attributes
+	if decompress and api.ResourceAttrs.resCompressed in attributes:
 		try:
-			res.compressed_info
+			compressed_info = res.compressed_info
 		except compress.DecompressError:
 			length_desc = f"unparseable compressed data header ({res.length_raw} bytes compressed)"
 		else:
-			assert res.compressed_info is not None
-			length_desc = f"{res.length} bytes ({res.length_raw} bytes compressed)"
+			assert compressed_info is not None
+			length_desc = f"{compressed_info.decompressed_length} bytes ({res.length_raw} bytes compressed)"
 	else:
 		length_desc = f"{res.length_raw} bytes"
 	content_desc_parts.append(length_desc)
 	
-	attrs = decompose_flags(res.attributes)
+	attrs = decompose_flags(attributes)
 	if attrs:
 		content_desc_parts.append(join_flag_names(attrs))
 	
@@ -276,7 +417,7 @@ def describe_resource(res: api.Resource, *, include_type: bool, decompress: bool
 	
 	desc = f"({id_desc}): {content_desc}"
 	if include_type:
-		quoted_restype = bytes_quote(res.type, "'")
+		quoted_restype = _quote_restype(res.type)
 		desc = f"{quoted_restype} {desc}"
 	return desc
 
@@ -297,6 +438,14 @@ def show_filtered_resources(resources: typing.Sequence[api.Resource], format: st
 		sys.exit(1)
 	
 	for res in resources:
+		if format == "raw" and decompress and res.compressed_info is not None:
+			# Data only as raw bytes, decompressed on the fly.
+			# The decompressed data is written out as it is produced, instead of decompressing the entire resource into memory first.
+			with res.open_raw() as compressed_f:
+				compressed_f.seek(res.compressed_info.header_length)
+				sys.stdout.buffer.writelines(compress.decompress_stream_parsed(res.compressed_info, compressed_f))
+			continue
+		
 		if decompress:
 			open_func = res.open
 		else:
@@ -308,8 +457,7 @@ def show_filtered_resources(resources: typing.Sequence[api.Resource], format: st
 				desc = describe_resource(res, include_type=True, decompress=decompress)
 				print(f"Resource {desc}:")
 				if format == "dump":
-					for line in hexdump_stream(f):
-						print(line)
+					write_lines(hexdump_stream(f))
 				elif format == "dump-text":
 					print(translate_text(f.read()))
 				else:
@@ -318,12 +466,12 @@ def show_filtered_resources(resources: typing.Sequence[api.Resource], format: st
 			elif format == "hex":
 				# Data only as hex
 				
-				for line in raw_hexdump_stream(f):
-					print(line)
+				write_lines(raw_hexdump_stream(f))
 			elif format == "raw":
 				# Data only as raw bytes
 				
-				shutil.copyfileobj(f, sys.stdout.buffer)
+				# The resource data stream is always in memory, so it can be written out in a single call. (This also avoids importing shutil just for copyfileobj, which noticeably adds to the startup time.)
+				sys.stdout.buffer.write(f.read())
 			elif format == "derez":
 				# Like DeRez with no resource definitions
 				
@@ -348,25 +496,10 @@ def show_filtered_resources(resources: typing.Sequence[api.Resource], format: st
 				
 				parts += attr_descs
 				
-				quoted_restype = bytes_quote(res.type, "'")
+				quoted_restype = _quote_restype(res.type)
 				print(f"data {quoted_restype} ({', '.join(parts)}{attrs_comment}) {{")
 				
-				bytes_line = f.read(16)
-				while bytes_line:
-					# Two-byte grouping is really annoying to implement.
-					groups = []
-					for j in range(0, 16, 2):
-						if j >= len(bytes_line):
-							break
-						elif j+1 >= len(bytes_line):
-							groups.append(f"{bytes_line[j]:02X}")
-						else:
-							groups.append(f"{bytes_line[j]:02X}{bytes_line[j+1]:02X}")
-					
-					s = f'$"{" ".join(groups)}"'
-					comment = "/* " + bytes_line.decode(_TEXT_ENCODING).translate(_TRANSLATE_NONPRINTABLES) + " */"
-					print(f"\t{s:<54s}{comment}")
-					bytes_line = f.read(16)
+				write_lines(derez_data_stream(f))
 				
 				print("};")
 				print()
@@ -381,33 +514,36 @@ def list_resources(resources: typing.List[api.Resource], *, sort: bool, group: s
 	
 	if group == "none":
 		if sort:
-			resources.sort(key=lambda res: (res.type, res.id))
+			resources.sort(key=operator.attrgetter("type", "id"))
 		print(f"{len(resources)} resources:")
-		for res in resources:
-			print(describe_resource(res, include_type=True, decompress=decompress))
+		write_lines(describe_resource(res, include_type=True, decompress=decompress) for res in resources)
 	elif group == "type":
-		if sort:
-			resources.sort(key=lambda res: res.type)
-		resources_by_type = {restype: list(reses) for restype, reses in itertools.groupby(resources, key=lambda res: res.type)}
+		# Group the resources in a single pass. Each group keeps the resources in their original order.
+		resources_by_type: typing.Dict[bytes, typing.List[api.Resource]] = {}
+		for res in resources:
+			resources_by_type.setdefault(res.type, []).append(res)
+		restypes: typing.Iterable[bytes] = sorted(resources_by_type) if sort else resources_by_type
 		print(f"{len(resources_by_type)} resource types:")
-		for restype, restype_resources in resources_by_type.items():
-			quoted_restype = bytes_quote(restype, "'")
+		for restype in restypes:
+			restype_resources = resources_by_type[restype]
+			quoted_restype = _quote_restype(restype)
 			print(f"{quoted_restype}: {len(restype_resources)} resources:")
 			if sort:
-				restype_resources.sort(key=lambda res: res.id)
-			for res in restype_resources:
-				print(describe_resource(res, include_type=False, decompress=decompress))
+				restype_resources.sort(key=operator.attrgetter("id"))
+			write_lines(describe_resource(res, include_type=False, decompress=decompress) for res in restype_resources)
 			print()
 	elif group == "id":
-		resources.sort(key=lambda res: res.id)
-		resources_by_id = {resid: list(reses) for resid, reses in itertools.groupby(resources, key=lambda res: res.id)}
+		resources_by_id: typing.Dict[int, typing.List[api.Resource]] = {}
+		for res in resources:
+			resources_by_id.setdefault(res.id, []).append(res)
 		print(f"{len(resources_by_id)} resource IDs:")
-		for resid, resid_resources in resources_by_id.items():
+		# The ID groups are always listed in ascending order, even if sorting is disabled, because otherwise they would appear in a mostly arbitrary order.
+		for resid in sorted(resources_by_id):
+			resid_resources = resources_by_id[resid]
 			print(f"({resid}): {len(resid_resources)} resources:")
 			if sort:
-				resid_resources.sort(key=lambda res: res.type)
-			for res in resid_resources:
-				print(describe_resource(res, include_type=True, decompress=decompress))
+				resid_resources.sort(key=operator.attrgetter("type"))
+			write_lines(describe_resource(res, include_type=True, decompress=decompress) for res in resid_resources)
 			print()
 	else:
 		raise AssertionError(f"Unhandled group mode: {group!r}")
@@ -428,16 +564,14 @@ def format_compressed_header_info(header_info: compress.CompressedHeaderInfo) ->
 		raise AssertionError(f"Unhandled compressed header info type: {type(header_info)}")
 
 
-def make_subcommand_parser(subs: typing.Any, name: str, *, help: str, description: str, **kwargs: typing.Any) -> argparse.ArgumentParser:
-	"""Add a subcommand parser with some slightly modified defaults to a subcommand set.
+def make_argument_parser(*, description: str, **kwargs: typing.Any) -> argparse.ArgumentParser:
+	"""Create an argparse.ArgumentParser with some slightly modified defaults.
 	
-	This function is used to ensure that all subcommands use the same base configuration for their ArgumentParser.
+	This function is used to ensure that all subcommands and the top-level parser use the same base configuration for their ArgumentParser.
 	"""
 	
-	ap = subs.add_parser(
-		name,
+	ap = argparse.ArgumentParser(
 		formatter_class=argparse.RawDescriptionHelpFormatter,
-		help=help,
 		description=description,
 		allow_abbrev=False,
 		add_help=False,
@@ -490,12 +624,42 @@ def open_resource_file(file: str, *, fork: str) -> api.ResourceFile:
 			print("Cannot specify an explicit fork when reading from stdin", file=sys.stderr)
 			sys.exit(1)
 		
-		return api.ResourceFile(sys.stdin.buffer)
+		# The command-line tool owns its input for the rest of the process, so the caveats of memory-mapping (see ResourceFile.__init__) don't matter much here.
+		# If stdin is redirected from a file, it is mapped like any other file. Otherwise (e. g. for pipes) memory-mapping silently falls back to reading the stream.
+		return api.ResourceFile(sys.stdin.buffer, memory_map=True)
 	else:
-		return api.ResourceFile.open(file, fork=fork)
+		return api.ResourceFile.open(file, fork=fork, memory_map=True)
+
+
+def do_read_header(prog: str, args: typing.List[str]) -> typing.NoReturn:
+	"""Read the header data from a resource file."""
+	
+	ap = make_argument_parser(
+		prog=prog,
+		description="""
+Read and output a resource file's header data.
+
+The header data consists of two parts:
+
+The system-reserved data is 112 bytes long and used by the Classic Mac OS
+Finder as temporary storage space. It usually contains parts of the
+file metadata (name, type/creator code, etc.).
 
+The application-specific data is 128 bytes long and is available for use by
+applications. In practice it usually contains junk data that happened to be in
+memory when the resource file was written.
 
-def do_read_header(ns: argparse.Namespace) -> typing.NoReturn:
+Mac OS X does not use the header data fields anymore. Resource files written
+on Mac OS X normally have both parts of the header data set to all zero bytes.
+""",
+	)
+	
+	ap.add_argument("--format", choices=["dump", "dump-text", "hex", "raw"], default="dump", help="How to output the header data: human-readable info with hex dump (dump) (default), human-readable info with newline-translated data (dump-text), data only as hex (hex), or data only as raw bytes (raw). Default: %(default)s")
+	ap.add_argument("--part", choices=["system", "application", "all"], default="all", help="Which part of the header to read. Default: %(default)s")
+	add_resource_file_args(ap)
+	
+	ns = ap.parse_args(args)
+	
 	with open_resource_file(ns.file, fork=ns.fork) as rf:
 		if ns.format in {"dump", "dump-text"}:
 			if ns.format == "dump":
@@ -508,13 +672,11 @@ def do_read_header(ns: argparse.Namespace) -> typing.NoReturn:
 			
 			if ns.part in {"system", "all"}:
 				print("System-reserved header data:")
-				for line in dump_func(rf.header_system_data):
-					print(line)
+				write_lines(dump_func(rf.header_system_data))
 			
 			if ns.part in {"application", "all"}:
 				print("Application-specific header data:")
-				for line in dump_func(rf.header_application_data):
-					print(line)
+				write_lines(dump_func(rf.header_application_data))
 		elif ns.format in {"hex", "raw"}:
 			if ns.part == "system":
 				data = rf.header_system_data
@@ -526,8 +688,7 @@ def do_read_header(ns: argparse.Namespace) -> typing.NoReturn:
 				raise AssertionError(f"Unhandled --part: {ns.part!r}")
 			
 			if ns.format == "hex":
-				for line in raw_hexdump(data):
-					print(line)
+				write_lines(raw_hexdump(data))
 			elif ns.format == "raw":
 				sys.stdout.buffer.write(data)
 			else:
@@ -538,15 +699,26 @@ def do_read_header(ns: argparse.Namespace) -> typing.NoReturn:
 	sys.exit(0)
 
 
-def do_info(ns: argparse.Namespace) -> typing.NoReturn:
+def do_info(prog: str, args: typing.List[str]) -> typing.NoReturn:
+	"""Display technical information about the resource file."""
+	
+	ap = make_argument_parser(
+		prog=prog,
+		description="""
+Display technical information and stats about the resource file.
+""",
+	)
+	
+	add_resource_file_args(ap)
+	
+	ns = ap.parse_args(args)
+	
 	with open_resource_file(ns.file, fork=ns.fork) as rf:
 		print("System-reserved header data:")
-		for line in hexdump(rf.header_system_data):
-			print(line)
+		write_lines(hexdump(rf.header_system_data))
 		print()
 		print("Application-specific header data:")
-		for line in hexdump(rf.header_application_data):
-			print(line)
+		write_lines(hexdump(rf.header_application_data))
 		print()
 		
 		print(f"Resource data starts at {rf.data_offset:#x} and is {rf.data_length:#x} bytes long")
@@ -563,7 +735,31 @@ def do_info(ns: argparse.Namespace) -> typing.NoReturn:
 	sys.exit(0)
 
 
-def do_list(ns: argparse.Namespace) -> typing.NoReturn:
+def do_list(prog: str, args: typing.List[str]) -> typing.NoReturn:
+	"""List the resources in a file."""
+	
+	ap = make_argument_parser(
+		prog=prog,
+		description=f"""
+List the resources stored in a resource file.
+
+Each resource's type, ID, name (if any), attributes (if any), and data length
+are displayed. For compressed resources, the compressed and decompressed data
+length are displayed, as well as the ID of the 'dcmp' resource used to
+decompress the resource data.
+
+{RESOURCE_FILTER_HELP}
+""",
+	)
+	
+	ap.add_argument("--no-decompress", action="store_false", dest="decompress", help="Do not parse the data header of compressed resources and only output their compressed length.")
+	ap.add_argument("--group", action="store", choices=["none", "type", "id"], default="type", help="Group resources by type or ID, or disable grouping. Default: %(default)s")
+	ap.add_argument("--no-sort", action="store_false", dest="sort", help="Output resources in the order in which they are stored in the file, instead of sorting them by type and ID.")
+	add_resource_file_args(ap)
+	add_resource_filter_args(ap)
+	
+	ns = ap.parse_args(args)
+	
 	with open_resource_file(ns.file, fork=ns.fork) as rf:
 		if not rf:
 			print("No resources (empty resource file)")
@@ -574,19 +770,37 @@ def do_list(ns: argparse.Namespace) -> typing.NoReturn:
 	sys.exit(0)
 
 
-def do_resource_info(ns: argparse.Namespace) -> typing.NoReturn:
+def do_resource_info(prog: str, args: typing.List[str]) -> typing.NoReturn:
+	"""Display technical information about resources."""
+	
+	ap = make_argument_parser(
+		prog=prog,
+		description=f"""
+Display technical information about one or more resources.
+
+{RESOURCE_FILTER_HELP}
+""",
+	)
+	
+	ap.add_argument("--no-decompress", action="store_false", dest="decompress", help="Do not parse the contents of compressed resources, only output regular resource information.")
+	ap.add_argument("--no-sort", action="store_false", dest="sort", help="Output resources in the order in which they are stored in the file, instead of sorting them by type and ID.")
+	add_resource_file_args(ap)
+	add_resource_filter_args(ap)
+	
+	ns = ap.parse_args(args)
+	
 	with open_resource_file(ns.file, fork=ns.fork) as rf:
 		resources = list(filter_resources(rf, ns.filter))
 		
 		if ns.sort:
-			resources.sort(key=lambda res: (res.type, res.id))
+			resources.sort(key=operator.attrgetter("type", "id"))
 		
 		if not resources:
 			print("No resources matched the filter")
 			sys.exit(0)
 		
 		for res in resources:
-			quoted_restype = bytes_quote(res.type, "'")
+			quoted_restype = _quote_restype(res.type)
 			print(f"Resource {quoted_restype} ({res.id}):")
 			
 			if res.name is None:
@@ -596,7 +810,8 @@ def do_resource_info(ns: argparse.Namespace) -> typing.NoReturn:
 				quoted_name = bytes_quote(res.name, '"')
 				print(f'\tName: {quoted_name} (at offset {res.name_offset} in name list)')
 			
-			attrs = decompose_flags(res.attributes)
+			attributes = res.attributes
+			attrs = decompose_flags(attributes)
 			if attrs:
 				attrs_desc = join_flag_names(attrs)
 			else:
@@ -605,36 +820,68 @@ def do_resource_info(ns: argparse.Namespace) -> typing.NoReturn:
 			
 			print(f"\tData: {res.length_raw} bytes stored at offset {res.data_raw_offset} in resource file data")
 			
-			if api.ResourceAttrs.resCompressed in res.attributes and ns.decompress:
+			if api.ResourceAttrs.resCompressed in attributes and ns.decompress:
 				print()
 				print("\tCompressed resource header info:")
 				try:
-					res.compressed_info
+					compressed_info = res.compressed_info
 				except compress.DecompressError:
 					print("\t\t(failed to parse compressed resource header)")
 				else:
-					assert res.compressed_info is not None
-					for line in format_compressed_header_info(res.compressed_info):
-						print(f"\t\t{line}")
+					assert compressed_info is not None
+					write_lines(f"\t\t{line}" for line in format_compressed_header_info(compressed_info))
 			
 			print()
 	
 	sys.exit(0)
 
 
-def do_read(ns: argparse.Namespace) -> typing.NoReturn:
+def do_read(prog: str, args: typing.List[str]) -> typing.NoReturn:
+	"""Read data from resources."""
+	
+	ap = make_argument_parser(
+		prog=prog,
+		description=f"""
+Read the data of one or more resources.
+
+{RESOURCE_FILTER_HELP}
+""",
+	)
+	
+	ap.add_argument("--no-decompress", action="store_false", dest="decompress", help="Do not decompress compressed resources, output the raw compressed resource data.")
+	ap.add_argument("--format", choices=["dump", "dump-text", "hex", "raw", "derez"], default="dump", help="How to output the resources: human-readable info with hex dump (dump), human-readable info with newline-translated data (dump-text), data only as hex (hex), data only as raw bytes (raw), or like DeRez with no resource definitions (derez). Default: %(default)s")
+	ap.add_argument("--no-sort", action="store_false", dest="sort", help="Output resources in the order in which they are stored in the file, instead of sorting them by type and ID.")
+	add_resource_file_args(ap)
+	add_resource_filter_args(ap)
+	
+	ns = ap.parse_args(args)
+	
 	with open_resource_file(ns.file, fork=ns.fork) as rf:
 		resources = list(filter_resources(rf, ns.filter))
 		
 		if ns.sort:
-			resources.sort(key=lambda res: (res.type, res.id))
+			resources.sort(key=operator.attrgetter("type", "id"))
 		
 		show_filtered_resources(resources, format=ns.format, decompress=ns.decompress)
 	
 	sys.exit(0)
 
 
-def do_raw_compress_info(ns: argparse.Namespace) -> typing.NoReturn:
+def do_raw_compress_info(prog: str, args: typing.List[str]) -> typing.NoReturn:
+	"""Display technical information about raw compressed resource data."""
+	
+	ap = make_argument_parser(
+		prog=prog,
+		description="""
+Display technical information about raw compressed resource data that is stored
+in a standalone file and not as a resource in a resource file.
+""",
+	)
+	
+	ap.add_argument("input_file", help="The file from which to read the compressed resource data, or - for stdin.")
+	
+	ns = ap.parse_args(args)
+	
 	if ns.input_file == "-":
 		in_stream = sys.stdin.buffer
 		close_in_stream = False
@@ -643,8 +890,7 @@ def do_raw_compress_info(ns: argparse.Namespace) -> typing.NoReturn:
 		close_in_stream = True
 	
 	try:
-		for line in format_compressed_header_info(compress.CompressedHeaderInfo.parse_stream(in_stream)):
-			print(line)
+		write_lines(format_compressed_header_info(compress.CompressedHeaderInfo.parse_stream(in_stream)))
 	finally:
 		if close_in_stream:
 			in_stream.close()
@@ -652,7 +898,33 @@ def do_raw_compress_info(ns: argparse.Namespace) -> typing.NoReturn:
 	sys.exit(0)
 
 
-def do_raw_decompress(ns: argparse.Namespace) -> typing.NoReturn:
+def do_raw_decompress(prog: str, args: typing.List[str]) -> typing.NoReturn:
+	"""Decompress raw compressed resource data."""
+	
+	ap = make_argument_parser(
+		prog=prog,
+		description="""
+Decompress raw compressed resource data that is stored in a standalone file
+and not as a resource in a resource file.
+
+This subcommand can be used in a shell pipeline by passing - as the input and
+output file name, i. e. "%(prog)s - -".
+
+Note: All other rsrcfork subcommands natively support compressed resources and
+will automatically decompress them as needed. This subcommand is only needed
+to decompress resource data that has been read from a resource file in
+compressed form (e. g. using --no-decompress or another tool that does not
+handle resource compression).
+""",
+	)
+	
+	ap.add_argument("--debug", action="store_true", help="Display debugging output from the decompressor on stdout. Cannot be used if the output file is - (stdout).")
+	
+	ap.add_argument("input_file", help="The file from which to read the compressed resource data, or - for stdin.")
+	ap.add_argument("output_file", help="The file to which to write the decompressed resource data, or - for stdout.")
+	
+	ns = ap.parse_args(args)
+	
 	if ns.input_file == "-":
 		in_stream = sys.stdin.buffer
 		close_in_stream = False
@@ -677,8 +949,8 @@ def do_raw_decompress(ns: argparse.Namespace) -> typing.NoReturn:
 			close_out_stream = True
 		
 		try:
-			for chunk in compress.decompress_stream_parsed(header_info, in_stream, debug=ns.debug):
-				out_stream.write(chunk)
+			# The decompressors produce many small chunks, so write them using writelines, which loops over them without running Python code for each chunk.
+			out_stream.writelines(compress.decompress_stream_parsed(header_info, in_stream, debug=ns.debug))
 		finally:
 			if close_out_stream:
 				out_stream.close()
@@ -689,13 +961,28 @@ def do_raw_decompress(ns: argparse.Namespace) -> typing.NoReturn:
 	sys.exit(0)
 
 
-def main() -> typing.NoReturn:
-	"""Main function of the CLI.
+SUBCOMMANDS: typing.Dict[str, typing.Callable[[str, typing.List[str]], typing.NoReturn]] = {
+	"read-header": do_read_header,
+	"info": do_info,
+	"list": do_list,
+	"resource-info": do_resource_info,
+	"read": do_read,
+	"raw-compress-info": do_raw_compress_info,
+	"raw-decompress": do_raw_decompress,
+}
+
+
+@functools.lru_cache(maxsize=None)
+def make_main_argument_parser(prog: str) -> argparse.ArgumentParser:
+	"""Create the top-level ArgumentParser, which lists all subcommands in its help.
 	
-	This function is a valid setuptools entry point. Arguments are passed in sys.argv, and every execution path ends with a sys.exit call. (setuptools entry points are also permitted to return an integer, which will be treated as an exit code. We do not use this feature and instead always call sys.exit ourselves.)
+	This parser is only used for the top-level options (--help and --version) and to report invalid or missing subcommands. Each subcommand's arguments are parsed separately by the subcommand's own parser, which is only created when that subcommand is run.
+	
+	The parser is cached, so that it isn't rebuilt if main is called more than once in the same process. Parsing arguments doesn't modify the parser, so it can safely be reused.
 	"""
 	
-	ap = argparse.ArgumentParser(
+	ap = make_argument_parser(
+		prog=prog,
 		description="""
 %(prog)s is a tool for working with Classic Mac OS resource files.
 Currently this tool can only read resource files; modifying/writing resource
@@ -707,12 +994,8 @@ does not change much across versions, but this should not be relied on.
 Automated scripts and programs should use the Python API provided by the
 rsrcfork library, which this tool is a part of.
 """,
-		formatter_class=argparse.RawDescriptionHelpFormatter,
-		allow_abbrev=False,
-		add_help=False,
 	)
 	
-	ap.add_argument("--help", action="help", help="Display this help message and exit.")
 	ap.add_argument("--version", action="version", version=__version__, help="Display version information and exit.")
 	
 	subs = ap.add_subparsers(
@@ -721,155 +1004,64 @@ rsrcfork library, which this tool is a part of.
 		metavar="SUBCOMMAND",
 	)
 	
-	ap_read_header = make_subcommand_parser(
-		subs,
-		"read-header",
-		help="Read the header data from a resource file.",
-		description="""
-Read and output a resource file's header data.
-
-The header data consists of two parts:
-
-The system-reserved data is 112 bytes long and used by the Classic Mac OS
-Finder as temporary storage space. It usually contains parts of the
-file metadata (name, type/creator code, etc.).
-
-The application-specific data is 128 bytes long and is available for use by
-applications. In practice it usually contains junk data that happened to be in
-memory when the resource file was written.
-
-Mac OS X does not use the header data fields anymore. Resource files written
-on Mac OS X normally have both parts of the header data set to all zero bytes.
-""",
-	)
-	
-	ap_read_header.add_argument("--format", choices=["dump", "dump-text", "hex", "raw"], default="dump", help="How to output the header data: human-readable info with hex dump (dump) (default), human-readable info with newline-translated data (dump-text), data only as hex (hex), or data only as raw bytes (raw). Default: %(default)s")
-	ap_read_header.add_argument("--part", choices=["system", "application", "all"], default="all", help="Which part of the header to read. Default: %(default)s")
-	add_resource_file_args(ap_read_header)
+	for name, func in SUBCOMMANDS.items():
+		# The subcommand parsers here are empty and only used to list the subcommands in the help. The subcommand's arguments are parsed by the subcommand function itself.
+		# Each command's short help is taken from the implementation function's docstring.
+		subs.add_parser(name, help=func.__doc__, add_help=False)
 	
-	ap_info = make_subcommand_parser(
-		subs,
-		"info",
-		help="Display technical information about the resource file.",
-		description="""
-Display technical information and stats about the resource file.
-""",
-	)
-	add_resource_file_args(ap_info)
-	
-	ap_list = make_subcommand_parser(
-		subs,
-		"list",
-		help="List the resources in a file.",
-		description=f"""
-List the resources stored in a resource file.
-
-Each resource's type, ID, name (if any), attributes (if any), and data length
-are displayed. For compressed resources, the compressed and decompressed data
-length are displayed, as well as the ID of the 'dcmp' resource used to
-decompress the resource data.
-
-{RESOURCE_FILTER_HELP}
-""",
-	)
-	
-	ap_list.add_argument("--no-decompress", action="store_false", dest="decompress", help="Do not parse the data header of compressed resources and only output their compressed length.")
-	ap_list.add_argument("--group", action="store", choices=["none", "type", "id"], default="type", help="Group resources by type or ID, or disable grouping. Default: %(default)s")
-	ap_list.add_argument("--no-sort", action="store_false", dest="sort", help="Output resources in the order in which they are stored in the file, instead of sorting them by type and ID.")
-	add_resource_file_args(ap_list)
-	add_resource_filter_args(ap_list)
-	
-	ap_resource_info = make_subcommand_parser(
-		subs,
-		"resource-info",
-		help="Display technical information about resources.",
-		description=f"""
-Display technical information about one or more resources.
+	return ap
 
-{RESOURCE_FILTER_HELP}
-""",
-	)
-	
-	ap_resource_info.add_argument("--no-decompress", action="store_false", dest="decompress", help="Do not parse the contents of compressed resources, only output regular resource information.")
-	ap_resource_info.add_argument("--no-sort", action="store_false", dest="sort", help="Output resources in the order in which they are stored in the file, instead of sorting them by type and ID.")
-	add_resource_file_args(ap_resource_info)
-	add_resource_filter_args(ap_resource_info)
-	
-	ap_read = make_subcommand_parser(
-		subs,
-		"read",
-		help="Read data from resources.",
-		description=f"""
-Read the data of one or more resources.
 
-{RESOURCE_FILTER_HELP}
-""",
-	)
-	
-	ap_read.add_argument("--no-decompress", action="store_false", dest="decompress", help="Do not decompress compressed resources, output the raw compressed resource data.")
-	ap_read.add_argument("--format", choices=["dump", "dump-text", "hex", "raw", "derez"], default="dump", help="How to output the resources: human-readable info with hex dump (dump), human-readable info with newline-translated data (dump-text), data only as hex (hex), data only as raw bytes (raw), or like DeRez with no resource definitions (derez). Default: %(default)s")
-	ap_read.add_argument("--no-sort", action="store_false", dest="sort", help="Output resources in the order in which they are stored in the file, instead of sorting them by type and ID.")
-	add_resource_file_args(ap_read)
-	add_resource_filter_args(ap_read)
-	
-	ap_raw_compress_info = make_subcommand_parser(
-		subs,
-		"raw-compress-info",
-		help="Display technical information about raw compressed resource data.",
-		description="""
-Display technical information about raw compressed resource data that is stored
-in a standalone file and not as a resource in a resource file.
-""",
-	)
-	
-	ap_raw_compress_info.add_argument("input_file", help="The file from which to read the compressed resource data, or - for stdin.")
+def main() -> typing.NoReturn:
+	"""Main function of the CLI.
 	
-	ap_raw_decompress = make_subcommand_parser(
-		subs,
-		"raw-decompress",
-		help="Decompress raw compressed resource data.",
-		description="""
-Decompress raw compressed resource data that is stored in a standalone file
-and not as a resource in a resource file.
-
-This subcommand can be used in a shell pipeline by passing - as the input and
-output file name, i. e. "%(prog)s - -".
-
-Note: All other rsrcfork subcommands natively support compressed resources and
-will automatically decompress them as needed. This subcommand is only needed
-to decompress resource data that has been read from a resource file in
-compressed form (e. g. using --no-decompress or another tool that does not
-handle resource compression).
-""",
-	)
+	This function is a valid setuptools entry point. Arguments are passed in sys.argv, and every execution path ends with a sys.exit call. (setuptools entry points are also permitted to return an integer, which will be treated as an exit code. We do not use this feature and instead always call sys.exit ourselves.)
+	"""
 	
-	ap_raw_decompress.add_argument("--debug", action="store_true", help="Display debugging output from the decompressor on stdout. Cannot be used if the output file is - (stdout).")
-	
-	ap_raw_decompress.add_argument("input_file", help="The file from which to read the compressed resource data, or - for stdin.")
-	ap_raw_decompress.add_argument("output_file", help="The file to which to write the decompressed resource data, or - for stdout.")
-	
-	ns = ap.parse_args()
-	
-	if ns.subcommand is None:
-		# TODO Remove this branch once we drop Python 3.6 compatibility, because this case will be handled by passing required=True to add_subparsers (see above).
-		print("Missing subcommand", file=sys.stderr)
-		sys.exit(2)
-	elif ns.subcommand == "read-header":
-		do_read_header(ns)
-	elif ns.subcommand == "info":
-		do_info(ns)
-	elif ns.subcommand == "list":
-		do_list(ns)
-	elif ns.subcommand == "resource-info":
-		do_resource_info(ns)
-	elif ns.subcommand == "read":
-		do_read(ns)
-	elif ns.subcommand == "raw-compress-info":
-		do_raw_compress_info(ns)
-	elif ns.subcommand == "raw-decompress":
-		do_raw_decompress(ns)
+	# Same as argparse's default prog.
+	prog = os.path.basename(sys.argv[0])
+	args = sys.argv[1:]
+	
+	if args and args[0] == "--version":
+		# Handle --version directly, because it doesn't need the parser at all. (If --version is the first argument, argparse would print the version and exit before looking at any of the other arguments as well.)
+		print(__version__)
+		sys.exit(0)
+	
+	subcommand_func = SUBCOMMANDS.get(args[0]) if args else None
+	if subcommand_func is not None:
+		# Fast path for the usual case where the first argument is a subcommand name.
+		# There are no top-level options to parse in that case, so the subcommand can be run directly, without creating the top-level parser or the parsers for all the other subcommands.
+		subcommand = args[0]
+		subcommand_args = args[1:]
 	else:
-		raise AssertionError(f"Subcommand not handled: {ns.subcommand!r}")
+		ap = make_main_argument_parser(prog)
+		
+		if args and not args[0].startswith("-"):
+			# The first argument is not an option, but also not a valid subcommand name, probably because of a typo.
+			# Report this the same way argparse would, but also suggest similar subcommand names, if there are any.
+			# (difflib is only imported here, because it's not needed otherwise and would add to the startup time.)
+			import difflib
+			choices = ", ".join(map(repr, SUBCOMMANDS))
+			message = f"argument SUBCOMMAND: invalid choice: {args[0]!r} (choose from {choices})"
+			suggestions = difflib.get_close_matches(args[0], SUBCOMMANDS, n=3, cutoff=0.6)
+			if suggestions:
+				message += f" - did you mean {' or '.join(map(repr, suggestions))}?"
+			ap.error(message)
+		
+		ns = ap.parse_args(args)
+		
+		if ns.subcommand is None:
+			# TODO Remove this branch once we drop Python 3.6 compatibility, because this case will be handled by passing required=True to add_subparsers (see above).
+			print("Missing subcommand", file=sys.stderr)
+			sys.exit(2)
+		
+		subcommand = ns.subcommand
+		# The parser only accepts valid subcommand names, so this lookup can't fail.
+		subcommand_func = SUBCOMMANDS[subcommand]
+		# The top-level parser's subcommand parsers don't accept any arguments, so if parsing succeeded, there are none to pass on.
+		subcommand_args = []
+	
+	subcommand_func(f"{prog} {subcommand}", subcommand_args)
 
 
 if __name__ == "__main__":
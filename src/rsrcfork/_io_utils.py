@@ -1,6 +1,7 @@
 """A collection of utility functions and classes related to IO streams. For internal use only."""
 
 import io
+import mmap
 import typing
 
 
@@ -19,6 +20,50 @@ def read_exact(stream: typing.BinaryIO, byte_count: int) -> bytes:
 	return data
 
 
+def try_fileno(stream: typing.BinaryIO) -> typing.Optional[int]:
+	"""Try to get the file descriptor of the plain file that the given stream reads from directly.
+	
+	Only file streams as returned by open (io.FileIO, optionally wrapped in an io.BufferedReader or io.BufferedRandom) are accepted. Other streams may also have a fileno method, but the data read from them doesn't necessarily match the file's contents - for example, gzip.GzipFile, bz2.BZ2File and lzma.LZMAFile return the file descriptor of the underlying compressed file.
+	
+	:param stream: The stream whose file descriptor should be returned.
+	:return: The stream's file descriptor, or None if the stream is not a plain file stream.
+	"""
+	
+	# Annotated as object so that mypy doesn't consider the isinstance checks unreachable (typing.BinaryIO is not related to the io classes).
+	raw: object = stream
+	if isinstance(raw, (io.BufferedReader, io.BufferedRandom)):
+		raw = raw.raw
+	if not isinstance(raw, io.FileIO):
+		return None
+	
+	try:
+		return raw.fileno()
+	except ValueError:
+		# The file has been closed.
+		return None
+
+
+def try_mmap(stream: typing.BinaryIO) -> typing.Optional[mmap.mmap]:
+	"""Try to create a read-only memory map of the entire file underlying the given stream.
+	
+	Memory-mapping is only attempted for plain file streams, as determined by try_fileno. For all other streams (in-memory streams, compressed file wrappers like gzip.GzipFile, pipes, empty files, etc.), or if memory-mapping fails for any other reason, None is returned and the caller should fall back to reading from the stream normally.
+	
+	:param stream: The stream whose underlying file should be mapped.
+	:return: A read-only memory map of the file, or None if the file cannot be memory-mapped.
+	"""
+	
+	fileno = try_fileno(stream)
+	if fileno is None:
+		return None
+	
+	try:
+		return mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+	except (OSError, ValueError):
+		# OSError: the file cannot be memory-mapped (e. g. because it is a pipe or character device).
+		# ValueError: the file is empty.
+		return None
+
+
 if typing.TYPE_CHECKING:
 	class PeekableIO(typing.Protocol):
 		"""Minimal protocol for binary IO streams that support the peek method.
@@ -1,9 +1,11 @@
-import collections
-import collections.abc
+import array
 import enum
+import functools
 import io
+import mmap
 import os
 import struct
+import sys
 import types
 import typing
 import warnings
@@ -25,6 +27,10 @@ from . import compress
 # 128 bytes: Application-specific data. In practice, this is usually all null bytes.
 STRUCT_RESOURCE_HEADER = struct.Struct(">IIII112s128s")
 
+# Only the offset and length fields from the start of the resource file header (see above).
+# The system-reserved and application-specific data is rarely needed, so it is only sliced out of the raw header data when it is accessed.
+STRUCT_RESOURCE_HEADER_OFFSETS = struct.Struct(">IIII")
+
 # Header for a single resource data block, found immediately before the resource data itself.
 # 4 bytes: Length of following resource data.
 STRUCT_RESOURCE_DATA_HEADER = struct.Struct(">I")
@@ -51,10 +57,11 @@ STRUCT_RESOURCE_TYPE = struct.Struct(">4sHH")
 # A single resource reference in a reference list. (A reference list has no header, and neither does the list of reference lists.)
 # 2 bytes: Resource ID.
 # 2 bytes: Offset from beginning of resource name list to length of resource name, or -1 (0xffff) if none.
-# 1 byte: Resource attributes. Combination of ResourceAttrs flags, see below. (Note: packed into 4 bytes together with the next 3 bytes.)
-# 3 bytes: Offset from beginning of resource data to length of data for this resource. (Note: packed into 4 bytes together with the previous 1 byte.)
+# 1 byte: Resource attributes. Combination of ResourceAttrs flags, see below.
+# 3 bytes: Offset from beginning of resource data to length of data for this resource. (Note: struct has no 3-byte integer format, so this is unpacked as raw bytes.)
 # 4 bytes: Reserved for handle to resource (in memory). Should be 0 in file.
-STRUCT_RESOURCE_REFERENCE = struct.Struct(">hHI4x")
+# (The reference lists are not actually unpacked using this struct, but split into separate columns for each field - see _unpack_reference_columns.)
+STRUCT_RESOURCE_REFERENCE = struct.Struct(">hHB3s4x")
 
 # Header for a resource name, found immediately before the name itself. (The name list has no header.)
 # 1 byte: Length of following resource name.
@@ -99,9 +106,68 @@ class ResourceAttrs(enum.Flag):
 	resCompressed = 1 << 0 # "indicates that the resource data is compressed" (only documented in https://github.com/kreativekorp/ksfl/wiki/Macintosh-Resource-File-Format)
 
 
+# array.array type code for unsigned 32-bit integers.
+# The sizes of the C types behind the type codes are platform-dependent, so the correct type code has to be determined at runtime.
+_ARRAY_TYPECODE_UINT32 = next(typecode for typecode in "IL" if array.array(typecode).itemsize == 4)
+
+
+def _gather_column(reference_list_data: bytes, start: int, field_size: int, array_typecode: str) -> array.array:
+	"""Collect the big-endian unsigned or signed integer field of field_size bytes at offset start from every reference in the reference list into an array with the given type code.
+	
+	The field bytes are stored directly in native byte order in the array's buffer, so that the array doesn't need to be byteswapped afterwards. If the field is shorter than the array's item size, the remaining high bytes are zero.
+	"""
+	
+	stride = STRUCT_RESOURCE_REFERENCE.size
+	count = len(reference_list_data) // stride
+	column = array.array(array_typecode)
+	item_size = column.itemsize
+	raw = bytearray(item_size * count)
+	for i in range(field_size):
+		# Position of this byte within a big-endian item.
+		position = item_size - field_size + i
+		if sys.byteorder == "little":
+			position = item_size - 1 - position
+		raw[position::item_size] = reference_list_data[start + i::stride]
+	column.frombytes(raw)
+	return column
+
+
+def _unpack_reference_columns(reference_list_data: bytes) -> typing.Tuple[array.array, array.array, bytes, array.array]:
+	"""Split a reference list into separate columns for the resource IDs, name offsets, attributes, and data offsets of all references in the list.
+	
+	Instead of unpacking every reference separately, the bytes of each field are collected from all references at once using extended slicing (which runs entirely in C), and are then converted to an array in one go. This avoids all per-reference work in Python code, which adds up for files with many resources.
+	"""
+	
+	ids = _gather_column(reference_list_data, 0, 2, "h")
+	name_offsets = _gather_column(reference_list_data, 2, 2, "H")
+	attributes = reference_list_data[4::STRUCT_RESOURCE_REFERENCE.size]
+	# The data offsets are 3 bytes long, so they are padded with a zero high byte to make them 32-bit integers.
+	data_offsets = _gather_column(reference_list_data, 5, 3, _ARRAY_TYPECODE_UINT32)
+	
+	return ids, name_offsets, attributes, data_offsets
+
+
+# Constructing enum.Flag values is relatively slow, and resource attributes are converted once for every resource in a file.
+# The attributes are a single byte, so all possible values are constructed once in advance and then looked up by index.
+_ATTRS_TABLE: typing.Tuple[ResourceAttrs, ...] = tuple(ResourceAttrs(attributes) for attributes in range(1 << 8))
+
+
+@functools.lru_cache(maxsize=None)
+def _file_attrs(file_attributes: int) -> ResourceFileAttrs:
+	"""Convert the raw resource file attributes to a ResourceFileAttrs value.
+	
+	There are too many possible values to precompute them all like for resource attributes, so the results are cached instead.
+	"""
+	
+	return ResourceFileAttrs(file_attributes)
+
+
 class Resource(object):
 	"""A single resource from a resource file."""
 	
+	# Resource objects are created lazily the first time each resource is looked up, and are then cached for as long as the resource file is open. Files may contain thousands of resources, so use slots to make the cached objects smaller and cheaper to create.
+	__slots__ = ("_resfile", "type", "id", "name_offset", "_name", "attributes", "data_raw_offset", "_length_raw", "_data_raw", "_compressed_info", "_data_decompressed")
+	
 	_resfile: "ResourceFile"
 	type: bytes
 	id: int
@@ -131,8 +197,12 @@ class Resource(object):
 	
 	def __repr__(self) -> str:
 		try:
-			with self.open() as f:
-				data = f.read(33)
+			if ResourceAttrs.resCompressed in self.attributes:
+				with self.open() as f:
+					data = f.read(33)
+			else:
+				# Only the start of the data is shown, so don't read (and cache) the entire data of uncompressed resources.
+				data = self._resfile._read_data(self.data_raw_offset + STRUCT_RESOURCE_DATA_HEADER.size, min(33, self.length_raw))
 		except compress.DecompressError:
 			decompress_ok = False
 			with self.open_raw() as f:
@@ -165,13 +235,7 @@ class Resource(object):
 		try:
 			return self._name
 		except AttributeError:
-			if self.name_offset == 0xffff:
-				self._name = None
-			else:
-				self._resfile._stream.seek(self._resfile.map_offset + self._resfile.map_name_list_offset + self.name_offset)
-				(name_length,) = self._resfile._stream_unpack(STRUCT_RESOURCE_NAME_HEADER)
-				self._name = self._resfile._read_exact(name_length)
-			
+			self._name = self._resfile._read_name(self.name_offset)
 			return self._name
 	
 	@property
@@ -179,8 +243,7 @@ class Resource(object):
 		try:
 			return self._data_raw
 		except AttributeError:
-			self._resfile._stream.seek(self._resfile.data_offset + self.data_raw_offset + STRUCT_RESOURCE_DATA_HEADER.size)
-			self._data_raw = _io_utils.read_exact(self._resfile._stream, self.length_raw)
+			self._data_raw = self._resfile._read_data(self.data_raw_offset + STRUCT_RESOURCE_DATA_HEADER.size, self.length_raw)
 			return self._data_raw
 	
 	def open_raw(self) -> typing.BinaryIO:
@@ -196,7 +259,17 @@ class Resource(object):
 		because the stream API does not require the entire resource data to be read in advance.
 		"""
 		
-		return io.BytesIO(self.data_raw)
+		try:
+			return io.BytesIO(self._data_raw)
+		except AttributeError:
+			pass
+		
+		if self._resfile._file_buf is not None or self._resfile._data_blob is not None:
+			# If the file data is in memory (or memory-mapped), the resource data can be sliced out of it again cheaply at any time.
+			# In that case, don't keep a second copy of the data in this Resource object after the stream is closed.
+			return io.BytesIO(self._resfile._read_data(self.data_raw_offset + STRUCT_RESOURCE_DATA_HEADER.size, self.length_raw))
+		else:
+			return io.BytesIO(self.data_raw)
 	
 	@property
 	def compressed_info(self) -> typing.Optional[compress.common.CompressedHeaderInfo]:
@@ -225,8 +298,8 @@ class Resource(object):
 		try:
 			return self._length_raw
 		except AttributeError:
-			self._resfile._stream.seek(self._resfile.data_offset + self.data_raw_offset)
-			(self._length_raw,) = self._resfile._stream_unpack(STRUCT_RESOURCE_DATA_HEADER)
+			# The data header is a single big-endian 32-bit length, which int.from_bytes can decode without the overhead of a struct unpack and its result tuple.
+			self._length_raw = int.from_bytes(self._resfile._read_data(self.data_raw_offset, STRUCT_RESOURCE_DATA_HEADER.size), "big")
 			return self._length_raw
 	
 	@property
@@ -276,41 +349,79 @@ class Resource(object):
 
 
 class _LazyResourceMap(typing.Mapping[int, Resource]):
-	"""Internal class: Read-only wrapper for a mapping of resource IDs to resource objects.
+	"""Internal class: Read-only mapping of resource IDs to resource objects, for all resources with one type code.
+	
+	The reference data for the resources is stored in compact parallel arrays (one per reference field), and the actual Resource objects are only created when they are first looked up. This makes opening a file cheaper, especially if only a few of its resources are accessed afterwards.
 	
 	This class behaves like a normal read-only mapping. The main difference to a plain dict (or similar mapping) is that this mapping has a specialized repr to avoid excessive output when working in the REPL.
 	"""
 	
+	__slots__ = ("type", "_resfile", "_rows", "_name_offsets", "_attributes", "_data_offsets", "_resources", "_name_index")
+	
 	type: bytes
-	_submap: typing.Mapping[int, Resource]
+	_resfile: "ResourceFile"
+	_rows: typing.Dict[int, int]
+	_name_offsets: array.array
+	_attributes: bytes
+	_data_offsets: array.array
+	_resources: typing.Dict[int, Resource]
+	_name_index: typing.Optional[typing.Dict[bytes, typing.List[int]]]
 	
-	def __init__(self, resource_type: bytes, submap: typing.Mapping[int, Resource]) -> None:
-		"""Create a new _LazyResourceMap that wraps the given mapping."""
+	def __init__(self, resfile: "ResourceFile", resource_type: bytes, ids: typing.Sequence[int], name_offsets: array.array, attributes: bytes, data_offsets: array.array) -> None:
+		"""Create a new _LazyResourceMap from the given reference data. The four sequences contain the values of the respective reference fields, in the order in which the references are stored in the file (as returned by _unpack_reference_columns)."""
 		
 		super().__init__()
 		
 		self.type = resource_type
-		self._submap = submap
+		self._resfile = resfile
+		# Maps each resource ID to its row in the reference arrays. If the same ID appears more than once, the last reference with that ID is used.
+		self._rows = {resource_id: row for row, resource_id in enumerate(ids)}
+		self._name_offsets = name_offsets
+		self._attributes = attributes
+		self._data_offsets = data_offsets
+		self._resources = {}
+		self._name_index = None
 	
 	def __len__(self) -> int:
 		"""Get the number of resources with this type code."""
 		
-		return len(self._submap)
+		return len(self._rows)
 	
 	def __iter__(self) -> typing.Iterator[int]:
 		"""Iterate over the IDs of all resources with this type code."""
 		
-		return iter(self._submap)
+		return iter(self._rows)
 	
 	def __contains__(self, key: object) -> bool:
 		"""Check if a resource with the given ID exists for this type code."""
 		
-		return key in self._submap
+		return key in self._rows
 	
 	def __getitem__(self, key: int) -> Resource:
 		"""Get a resource with the given ID for this type code."""
 		
-		return self._submap[key]
+		try:
+			return self._resources[key]
+		except KeyError:
+			row = self._rows[key]
+			# Resource objects are cached, so that repeated lookups return the same object, along with any data that it has already loaded.
+			resource = self._resources[key] = Resource(self._resfile, self.type, key, self._name_offsets[row], _ATTRS_TABLE[self._attributes[row]], self._data_offsets[row])
+			return resource
+	
+	def _ids_by_name(self) -> typing.Mapping[bytes, typing.List[int]]:
+		"""Get an index that maps resource names to the IDs of all resources with that name and this type code. Resources without a name are not included in the index.
+		
+		The index is built on first use and cached afterwards. Building the index only reads the resource names directly from the in-memory resource map, so no Resource objects are created and no resource data is read.
+		"""
+		
+		if self._name_index is None:
+			self._name_index = {}
+			for resource_id, row in self._rows.items():
+				name = self._resfile._read_name(self._name_offsets[row])
+				if name is not None:
+					self._name_index.setdefault(name, []).append(resource_id)
+		
+		return self._name_index
 	
 	def __repr__(self) -> str:
 		if len(self) == 1:
@@ -326,20 +437,25 @@ class ResourceFile(typing.Mapping[bytes, typing.Mapping[int, Resource]], typing.
 	
 	_close_stream: bool
 	_stream: typing.BinaryIO
+	_mmap: typing.Optional[mmap.mmap]
+	_file_buf: typing.Optional[typing.Union[bytes, mmap.mmap]]
+	_fd: typing.Optional[int]
+	_read_at: typing.Callable[[int, int], bytes]
 	
 	data_offset: int
 	map_offset: int
 	data_length: int
 	map_length: int
-	header_system_data: bytes
-	header_application_data: bytes
+	_header_data: bytes
 	
 	map_type_list_offset: int
 	map_name_list_offset: int
 	file_attributes: ResourceFileAttrs
 	
-	_reference_counts: typing.MutableMapping[bytes, int]
-	_references: typing.MutableMapping[bytes, typing.MutableMapping[int, Resource]]
+	_map_buf: bytes
+	_references: typing.Dict[bytes, _LazyResourceMap]
+	
+	_data_blob: typing.Optional[bytes]
 	
 	@classmethod
 	def open(cls, filename: typing.Union[str, os.PathLike], *, fork: str = "auto", **kwargs: typing.Any) -> "ResourceFile":
@@ -401,32 +517,56 @@ class ResourceFile(typing.Mapping[bytes, typing.Mapping[int, Resource]], typing.
 		else:
 			raise ValueError(f"Unsupported value for the fork parameter: {fork!r}")
 	
-	def __init__(self, stream: typing.BinaryIO, *, close: bool = False) -> None:
+	def __init__(self, stream: typing.BinaryIO, *, close: bool = False, eager: bool = False, memory_map: bool = False) -> None:
 		"""Create a ResourceFile wrapping the given byte stream.
 		
 		To read resource file data from a bytes object, wrap it in an io.BytesIO.
 		
-		If the stream is seekable, only the file header and resource map are read initially. Resource data and names are loaded on-demand when the respective resource is accessed. If the stream is not seekable, the entire stream data is read into memory (this is necessary because the resource map is stored at the end of the resource file).
+		If the stream is seekable, only the file header and resource map are read initially. Resource data and names are loaded on-demand when the respective resource is accessed. If the stream is not seekable, the entire stream data is read into memory (this is necessary because the resource map is stored at the end of the resource file), and resource data and names are sliced directly out of the in-memory data.
 		
 		In practice, memory usage is usually not a concern when reading resource files. Even large resource files are only a few megabytes in size, and due to limitations in the format, resource files cannot be much larger than 16 MiB (except for special cases that are unlikely to occur in practice).
 		
 		close controls whether the stream should be closed when the ResourceFile's close method is called. By default this is False.
+		
+		eager controls whether all resource data should be read into memory immediately, using one large read instead of many small reads when the resources are accessed. This is faster when most or all resources in the file will be accessed. Passing eager=True is equivalent to calling preload_all right after the ResourceFile is created. By default this is False.
+		
+		memory_map controls whether the file should be memory-mapped if the stream is seekable and reads directly from a plain file (as returned by open - other streams with a fileno method, like gzip.GzipFile, are never mapped), so that resource data can be sliced directly out of the mapped file instead of being read from the stream. This makes accessing many resources faster, but has some side effects: if the file is truncated by another process while it is mapped, accessing resource data may crash the interpreter (with SIGBUS) instead of raising an exception. The mapping stays open until this ResourceFile is closed, even if the stream is closed by the caller earlier (on Windows, this prevents the file from being deleted). Once this ResourceFile is closed, its resource data can no longer be accessed, even if the stream is still open. By default this is False.
 		"""
 		
 		super().__init__()
 		
 		self._close_stream = close
+		self._mmap = None
+		self._fd = None
+		self._data_blob = None
+		self._stream = stream
 		if stream.seekable():
-			self._stream = stream
+			if memory_map:
+				self._mmap = _io_utils.try_mmap(stream)
+			self._file_buf = self._mmap
+			if self._mmap is None and hasattr(os, "pread"):
+				# If the file isn't memory-mapped, but is still backed by a file descriptor, positioned reads can be used instead of seeking and reading.
+				self._fd = _io_utils.try_fileno(stream)
+		else:
+			# The entire file has to be read into memory anyway, so read it with a single read call and access it directly as one bytes object (just like a memory-mapped file).
+			# Everything is parsed using offsets into this data, so the stream itself is never read from again.
+			self._file_buf = stream.read()
+		
+		# _read_at is called for every resource data access. How data can be read doesn't change after the file has been opened, so select the right implementation once here, instead of checking again on every call.
+		if self._file_buf is not None:
+			self._read_at = self._read_at_buffer
+		elif self._fd is not None:
+			self._read_at = self._read_at_fd
 		else:
-			self._stream = io.BytesIO(stream.read())
+			self._read_at = self._read_at_stream
 		
 		try:
 			self._read_header()
-			self._stream.seek(self.map_offset)
+			self._read_map()
 			self._read_map_header()
-			self._read_all_resource_types()
-			self._read_all_references()
+			self._read_all_references(self._read_all_resource_types())
+			if eager:
+				self.preload_all()
 		except BaseException:
 			self.close()
 			raise
@@ -439,87 +579,174 @@ class ResourceFile(typing.Mapping[bytes, typing.Mapping[int, Resource]], typing.
 		except EOFError as e:
 			raise InvalidResourceFileError(str(e))
 	
-	def _stream_unpack(self, st: struct.Struct) -> tuple:
-		"""Unpack data from the stream according to the struct st. The number of bytes to read is determined using st.size, so variable-sized structs cannot be used with this method."""
+	def _blob_slice(self, blob: typing.Union[bytes, mmap.mmap], offset: int, byte_count: int) -> bytes:
+		"""Get byte_count bytes at offset from a preloaded blob and raise an exception if the blob is too short (analogous to _read_exact)."""
 		
-		try:
-			return st.unpack(self._read_exact(st.size))
-		except struct.error as e:
-			raise InvalidResourceFileError(str(e))
+		data = blob[offset:offset + byte_count]
+		if len(data) != byte_count:
+			raise InvalidResourceFileError(f"Attempted to read {byte_count} bytes of data, but only got {len(data)} bytes")
+		return data
 	
-	def _read_header(self) -> None:
-		"""Read the resource file header, starting at the current stream position."""
+	# The following three methods are the possible implementations of _read_at, which reads byte_count bytes starting at the given absolute offset in the resource file and raises an exception if too few bytes are available.
+	# ResourceFile.__init__ selects the appropriate one and assigns it to self._read_at.
+	
+	def _read_at_buffer(self, offset: int, byte_count: int) -> bytes:
+		"""Implementation of _read_at for files that are memory-mapped or were read into memory completely. The data is sliced directly out of memory."""
+		
+		assert self._file_buf is not None
+		return self._blob_slice(self._file_buf, offset, byte_count)
+	
+	def _read_at_fd(self, offset: int, byte_count: int) -> bytes:
+		"""Implementation of _read_at for files that are not memory-mapped, but have a file descriptor. The data is read using a single positioned read (os.pread), which doesn't change the stream position."""
+		
+		assert self._fd is not None
+		data = os.pread(self._fd, byte_count, offset)
+		if len(data) != byte_count:
+			raise InvalidResourceFileError(f"Attempted to read {byte_count} bytes of data, but only got {len(data)} bytes")
+		return data
+	
+	def _read_at_stream(self, offset: int, byte_count: int) -> bytes:
+		"""Implementation of _read_at for all other streams. The data is read from the stream, which changes the stream position."""
 		
-		assert self._stream.tell() == 0
+		self._stream.seek(offset)
+		return self._read_exact(byte_count)
+	
+	def _read_data(self, offset: int, byte_count: int) -> bytes:
+		"""Read byte_count bytes starting at the given offset relative to the start of the resource data, and raise an exception if too few bytes are available.
+		
+		If all resource data has been preloaded, the data is sliced out of the preloaded data. Otherwise this is the same as _read_at.
+		"""
+		
+		if self._data_blob is not None:
+			return self._blob_slice(self._data_blob, offset, byte_count)
+		else:
+			return self._read_at(self.data_offset + offset, byte_count)
+	
+	def _read_header(self) -> None:
+		"""Read the resource file header, which is located at the start of the resource file."""
 		
+		self._header_data = self._read_at(0, STRUCT_RESOURCE_HEADER.size)
 		(
 			self.data_offset,
 			self.map_offset,
 			self.data_length,
 			self.map_length,
-			self.header_system_data,
-			self.header_application_data,
-		) = self._stream_unpack(STRUCT_RESOURCE_HEADER)
+		) = STRUCT_RESOURCE_HEADER_OFFSETS.unpack_from(self._header_data)
 		
-		if self._stream.tell() != self.data_offset:
-			raise InvalidResourceFileError(f"The data offset ({self.data_offset}) should point exactly to the end of the file header ({self._stream.tell()})")
+		if self.data_offset != STRUCT_RESOURCE_HEADER.size:
+			raise InvalidResourceFileError(f"The data offset ({self.data_offset}) should point exactly to the end of the file header ({STRUCT_RESOURCE_HEADER.size})")
 	
-	def _read_map_header(self) -> None:
-		"""Read the map header, starting at the current stream position."""
+	@property
+	def header_system_data(self) -> bytes:
+		"""The system-reserved data from the resource file header. In practice, this is usually all null bytes."""
+		
+		return self._header_data[STRUCT_RESOURCE_HEADER_OFFSETS.size:STRUCT_RESOURCE_HEADER_OFFSETS.size + 112]
+	
+	@property
+	def header_application_data(self) -> bytes:
+		"""The application-specific data from the resource file header. In practice, this is usually all null bytes."""
 		
-		assert self._stream.tell() == self.map_offset
+		return self._header_data[STRUCT_RESOURCE_HEADER_OFFSETS.size + 112:]
+	
+	def _read_map(self) -> None:
+		"""Read the entire resource map into memory, so that it can be parsed without any further reads from the stream."""
+		
+		if self._file_buf is not None:
+			self._map_buf = self._file_buf[self.map_offset:self.map_offset + self.map_length]
+		else:
+			self._stream.seek(self.map_offset)
+			self._map_buf = self._stream.read(self.map_length)
+	
+	def _map_unpack(self, st: struct.Struct, offset: int) -> tuple:
+		"""Unpack data according to the struct st, starting at the given offset in the resource map."""
+		
+		try:
+			return st.unpack_from(self._map_buf, offset)
+		except struct.error as e:
+			raise InvalidResourceFileError(str(e))
+	
+	def _read_map_header(self) -> None:
+		"""Read the map header, which is located at the start of the resource map."""
 		
 		(
 			_file_attributes,
 			self.map_type_list_offset,
 			self.map_name_list_offset,
-		) = self._stream_unpack(STRUCT_RESOURCE_MAP_HEADER)
+		) = self._map_unpack(STRUCT_RESOURCE_MAP_HEADER, 0)
 		
-		self.file_attributes = ResourceFileAttrs(_file_attributes)
+		self.file_attributes = _file_attrs(_file_attributes)
 	
-	def _read_all_resource_types(self) -> None:
-		"""Read all resource types, starting at the current stream position."""
+	def _read_all_resource_types(self) -> typing.Dict[bytes, typing.Tuple[int, int]]:
+		"""Read all resource types from the type list, which is located at map_type_list_offset in the resource map.
+		
+		Returns a dict mapping each resource type to the number of resources with that type and the offset of their reference list in the resource map. This information is only needed to read the reference lists, so it is not stored permanently.
+		"""
 		
-		self._reference_counts = collections.OrderedDict()
+		reference_lists: typing.Dict[bytes, typing.Tuple[int, int]] = {}
 		
-		(type_list_length_m1,) = self._stream_unpack(STRUCT_RESOURCE_TYPE_LIST_HEADER)
+		offset = self.map_type_list_offset
+		(type_list_length_m1,) = self._map_unpack(STRUCT_RESOURCE_TYPE_LIST_HEADER, offset)
+		offset += STRUCT_RESOURCE_TYPE_LIST_HEADER.size
 		type_list_length = (type_list_length_m1 + 1) % 0x10000
 		
-		for _ in range(type_list_length):
-			(
-				resource_type,
-				count_m1,
-				reflist_offset,
-			) = self._stream_unpack(STRUCT_RESOURCE_TYPE)
+		# Unpack the entire type list at once and let struct do the per-entry unpacking in C.
+		type_list_data = self._blob_slice(self._map_buf, offset, type_list_length * STRUCT_RESOURCE_TYPE.size)
+		for resource_type, count_m1, reflist_offset in STRUCT_RESOURCE_TYPE.iter_unpack(type_list_data):
 			count = (count_m1 + 1) % 0x10000
-			self._reference_counts[resource_type] = count
-	
-	def _read_all_references(self) -> None:
-		"""Read all resource references, starting at the current stream position."""
-		
-		self._references = collections.OrderedDict()
-		
-		for resource_type, count in self._reference_counts.items():
-			resmap: typing.MutableMapping[int, Resource] = collections.OrderedDict()
-			self._references[resource_type] = resmap
-			for _ in range(count):
-				(
-					resource_id,
-					name_offset,
-					attributes_and_data_offset,
-				) = self._stream_unpack(STRUCT_RESOURCE_REFERENCE)
-				
-				attributes = attributes_and_data_offset >> 24
-				data_offset = attributes_and_data_offset & ((1 << 24) - 1)
-				
-				resmap[resource_id] = Resource(self, resource_type, resource_id, name_offset, ResourceAttrs(attributes), data_offset)
+			# The reference list offset is relative to the start of the type list.
+			reference_lists[resource_type] = (count, self.map_type_list_offset + reflist_offset)
+		
+		return reference_lists
+	
+	def _read_all_references(self, reference_lists: typing.Mapping[bytes, typing.Tuple[int, int]]) -> None:
+		"""Read all resource references, using the reference list locations returned by _read_all_resource_types."""
+		
+		self._references = {}
+		
+		for resource_type, (count, reflist_offset) in reference_lists.items():
+			# Split the whole reference list for this type into one column per field at once.
+			reference_list_data = self._blob_slice(self._map_buf, reflist_offset, count * STRUCT_RESOURCE_REFERENCE.size)
+			self._references[resource_type] = _LazyResourceMap(self, resource_type, *_unpack_reference_columns(reference_list_data))
+	
+	def _read_name(self, name_offset: int) -> typing.Optional[bytes]:
+		"""Read the resource name at the given offset in the resource name list, or return None if the offset is 0xffff (meaning that the resource has no name)."""
+		
+		if name_offset == 0xffff:
+			return None
+		
+		# The name list is part of the resource map, which is always kept in memory.
+		name_position = self.map_name_list_offset + name_offset
+		# The name header is a single length byte, which can be indexed directly instead of going through struct.
+		try:
+			name_length = self._map_buf[name_position]
+		except IndexError:
+			raise InvalidResourceFileError(f"Resource name offset ({name_position}) points past the end of the resource map ({len(self._map_buf)})")
+		return self._blob_slice(self._map_buf, name_position + STRUCT_RESOURCE_NAME_HEADER.size, name_length)
+	
+	def _resource_ids_by_name(self, resource_type: bytes) -> typing.Mapping[bytes, typing.List[int]]:
+		"""Get an index that maps resource names to the IDs of all resources with that name and the given type. Resources without a name are not included in the index."""
+		
+		return self._references[resource_type]._ids_by_name()
+	
+	def preload_all(self) -> None:
+		"""Read the entire resource data into memory at once, so that resource data can be looked up without further reads from the stream.
+		
+		This is faster than reading each resource's data separately when most or all resources in the file will be accessed. If the file is memory-mapped, or if the whole file had to be read into memory already (because the stream is not seekable), this method does nothing, because the resource data can already be accessed without any reads from the stream.
+		
+		Resource names don't need to be preloaded, because the name list is part of the resource map, which is always read completely when the file is opened.
+		"""
+		
+		if self._file_buf is None and self._data_blob is None:
+			self._data_blob = self._read_at(self.data_offset, self.data_length)
 	
 	def close(self) -> None:
 		"""Close this ResourceFile.
 		
-		If close=True was passed when this ResourceFile was created, the underlying stream's close method is called as well.
+		If close=True was passed when this ResourceFile was created, the underlying stream's close method is called as well. If the file was memory-mapped (see memory_map), the mapping is closed, so resource data can no longer be accessed afterwards.
 		"""
 		
+		if self._mmap is not None:
+			self._mmap.close()
 		if self._close_stream:
 			self._stream.close()
 	
@@ -553,7 +780,7 @@ class ResourceFile(typing.Mapping[bytes, typing.Mapping[int, Resource]], typing.
 	def __getitem__(self, key: bytes) -> "_LazyResourceMap":
 		"""Get a lazy mapping of all resources with the given type in this ResourceFile."""
 		
-		return _LazyResourceMap(key, self._references[key])
+		return self._references[key]
 	
 	def __repr__(self) -> str:
 		return f"<{type(self).__module__}.{type(self).__qualname__} at {id(self):#x}, attributes {self.file_attributes}, containing {len(self)} resource types: {list(self)}>"
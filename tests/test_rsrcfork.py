@@ -1,6 +1,8 @@
 import collections
+import gzip
 import io
 import pathlib
+import re
 import shutil
 import sys
 import tempfile
@@ -8,6 +10,7 @@ import typing
 import unittest
 
 import rsrcfork
+import rsrcfork.__main__
 
 RESOURCE_FORKS_SUPPORTED = sys.platform.startswith("darwin")
 RESOURCE_FORKS_NOT_SUPPORTED_MESSAGE = "Resource forks are only supported on Mac"
@@ -171,6 +174,13 @@ class ResourceFileReadTests(unittest.TestCase):
 				with rsrcfork.ResourceFile(usf) as rf:
 					self.internal_test_textclipping(rf)
 	
+	def test_textclipping_unseekable_stream_close(self) -> None:
+		with TEXTCLIPPING_RSRC_FILE.open("rb") as f:
+			usf = UnseekableStreamWrapper(f)
+			with rsrcfork.ResourceFile(usf, close=True) as rf:
+				self.internal_test_textclipping(rf)
+			self.assertTrue(usf.closed)
+	
 	def test_textclipping_path_data_fork(self) -> None:
 		with rsrcfork.open(TEXTCLIPPING_RSRC_FILE, fork="data") as rf:
 			self.internal_test_textclipping(rf)
@@ -248,29 +258,71 @@ class ResourceFileReadTests(unittest.TestCase):
 				with rsrcfork.open(temp_data_fork.name) as rf:
 					self.internal_test_textclipping(rf)
 	
+	def internal_test_testfile(self, rf: rsrcfork.ResourceFile) -> None:
+		self.assertEqual(rf.header_system_data, TESTFILE_HEADER_SYSTEM_DATA)
+		self.assertEqual(rf.header_application_data, TESTFILE_HEADER_APPLICATION_DATA)
+		self.assertEqual(rf.file_attributes, rsrcfork.ResourceFileAttrs.mapPrinterDriverMultiFinderCompatible | rsrcfork.ResourceFileAttrs.mapReadOnly)
+		self.assertEqual(list(rf), list(TESTFILE_RESOURCES))
+		
+		with self.assertRaises(KeyError):
+			rf[b"????"]
+		
+		for (actual_type, actual_reses), (expected_type, expected_reses) in zip(rf.items(), TESTFILE_RESOURCES.items()):
+			with self.subTest(type=expected_type):
+				self.assertEqual(actual_type, expected_type)
+				# Repeated lookups of the same type should return the same mapping object.
+				self.assertIs(rf[actual_type], actual_reses)
+				self.assertEqual(list(actual_reses), list(expected_reses))
+				
+				for (actual_id, actual_res), (expected_id, (expected_name, expected_attrs, expected_data)) in zip(actual_reses.items(), expected_reses.items()):
+					with self.subTest(id=expected_id):
+						self.assertEqual(actual_res.type, expected_type)
+						self.assertEqual(actual_id, expected_id)
+						# Repeated lookups of the same resource should return the same resource object.
+						self.assertIs(actual_reses[actual_id], actual_res)
+						self.assertEqual(actual_res.id, expected_id)
+						self.assertEqual(actual_res.name, expected_name)
+						self.assertEqual(actual_res.attributes, expected_attrs)
+						self.assertEqual(actual_res.data, expected_data)
+						with actual_res.open() as f:
+							self.assertEqual(f.read(), expected_data)
+						self.assertEqual(actual_res.compressed_info, None)
+	
 	def test_testfile(self) -> None:
 		with rsrcfork.open(TESTFILE_RSRC_FILE, fork="data") as rf:
-			self.assertEqual(rf.header_system_data, TESTFILE_HEADER_SYSTEM_DATA)
-			self.assertEqual(rf.header_application_data, TESTFILE_HEADER_APPLICATION_DATA)
-			self.assertEqual(rf.file_attributes, rsrcfork.ResourceFileAttrs.mapPrinterDriverMultiFinderCompatible | rsrcfork.ResourceFileAttrs.mapReadOnly)
-			self.assertEqual(list(rf), list(TESTFILE_RESOURCES))
+			self.internal_test_testfile(rf)
+	
+	def test_testfile_eager(self) -> None:
+		with rsrcfork.open(TESTFILE_RSRC_FILE, fork="data", eager=True) as rf:
+			self.internal_test_testfile(rf)
+	
+	def test_testfile_memory_map(self) -> None:
+		with rsrcfork.open(TESTFILE_RSRC_FILE, fork="data", memory_map=True) as rf:
+			self.internal_test_testfile(rf)
+	
+	def test_testfile_gzip(self) -> None:
+		# gzip.GzipFile is seekable and has a fileno method, but its file descriptor belongs to the compressed file, so it must be read like any other stream.
+		with tempfile.TemporaryDirectory() as tempdir:
+			gzip_path = pathlib.Path(tempdir) / "testfile.rsrc.gz"
+			with gzip.open(gzip_path, "wb") as f:
+				f.write(TESTFILE_RSRC_FILE.read_bytes())
 			
-			for (actual_type, actual_reses), (expected_type, expected_reses) in zip(rf.items(), TESTFILE_RESOURCES.items()):
-				with self.subTest(type=expected_type):
-					self.assertEqual(actual_type, expected_type)
-					self.assertEqual(list(actual_reses), list(expected_reses))
-					
-					for (actual_id, actual_res), (expected_id, (expected_name, expected_attrs, expected_data)) in zip(actual_reses.items(), expected_reses.items()):
-						with self.subTest(id=expected_id):
-							self.assertEqual(actual_res.type, expected_type)
-							self.assertEqual(actual_id, expected_id)
-							self.assertEqual(actual_res.id, expected_id)
-							self.assertEqual(actual_res.name, expected_name)
-							self.assertEqual(actual_res.attributes, expected_attrs)
-							self.assertEqual(actual_res.data, expected_data)
-							with actual_res.open() as f:
-								self.assertEqual(f.read(), expected_data)
-							self.assertEqual(actual_res.compressed_info, None)
+			with gzip.open(gzip_path, "rb") as f:
+				with rsrcfork.ResourceFile(f) as rf:
+					self.internal_test_testfile(rf)
+			
+			with gzip.open(gzip_path, "rb") as f:
+				with rsrcfork.ResourceFile(f, memory_map=True) as rf:
+					self.internal_test_testfile(rf)
+	
+	def test_testfile_preload_all(self) -> None:
+		# Use a stream that is seekable, but cannot be memory-mapped, so that the data is actually preloaded.
+		with open(TESTFILE_RSRC_FILE, "rb") as f:
+			data = f.read()
+		
+		with rsrcfork.ResourceFile(io.BytesIO(data)) as rf:
+			rf.preload_all()
+			self.internal_test_testfile(rf)
 	
 	def test_compress_compare(self) -> None:
 		# This test goes through pairs of resource files: one original file with both compressed and uncompressed resources, and one modified file where all compressed resources have been decompressed (using ResEdit on System 7.5.5).
@@ -325,5 +377,57 @@ class ResourceFileReadTests(unittest.TestCase):
 										self.assertEqual(compressed_res.length, compressed_res.length_raw)
 
 
+class ResourceFilterParseTests(unittest.TestCase):
+	def assert_filter(self, filter_str: str, restype: bytes, min_id: int, max_id: int, name: typing.Optional[bytes]) -> None:
+		filter_obj = rsrcfork.__main__.ResourceFilter.from_string(filter_str)
+		self.assertEqual(filter_obj.type, restype)
+		self.assertEqual(filter_obj.min_id, min_id)
+		self.assertEqual(filter_obj.max_id, max_id)
+		self.assertEqual(filter_obj.name, name)
+	
+	def test_type_only(self) -> None:
+		self.assert_filter("STR ", b"STR ", -0x8000, 0x7fff, None)
+		self.assert_filter("'STR '", b"STR ", -0x8000, 0x7fff, None)
+		self.assert_filter("'\\x00\\x01\\x02\\x03'", b"\x00\x01\x02\x03", -0x8000, 0x7fff, None)
+	
+	def test_id(self) -> None:
+		self.assert_filter("'STR ' (128)", b"STR ", 128, 128, None)
+		self.assert_filter("'STR ' (-16455)", b"STR ", -16455, -16455, None)
+		self.assert_filter("'STR ' ( 128 )", b"STR ", 128, 128, None)
+		self.assert_filter("'STR ' (1_28)", b"STR ", 128, 128, None)
+	
+	def test_id_range(self) -> None:
+		self.assert_filter("'STR ' (128:130)", b"STR ", 128, 130, None)
+		self.assert_filter("'STR ' (-200:-100)", b"STR ", -200, -100, None)
+		self.assert_filter("'STR ' (128 : 130)", b"STR ", 128, 130, None)
+	
+	def test_name(self) -> None:
+		self.assert_filter("'STR ' (\"Hello\")", b"STR ", -0x8000, 0x7fff, b"Hello")
+		self.assert_filter("'STR ' (\"a (b): \\\"c\\\"\")", b"STR ", -0x8000, 0x7fff, b'a (b): "c"')
+		self.assert_filter("'STR ' (\"\")", b"STR ", -0x8000, 0x7fff, b"")
+	
+	def test_escaped_quote_in_type(self) -> None:
+		self.assert_filter("'it\\'s'", b"it's", -0x8000, 0x7fff, None)
+		self.assert_filter("'it's'", b"it's", -0x8000, 0x7fff, None)
+		self.assert_filter("'it\\'s' (128)", b"it's", 128, 128, None)
+	
+	def test_invalid(self) -> None:
+		for filter_str, message in [
+			("STR (128)", "Resource type must be single-quoted"),
+			("'STR '(128)", "Resource type and ID must be separated by a space"),
+			("'STR ' 128", "Resource ID must be parenthesized"),
+			("'STR ' (1:2:3)", "Too many colons in ID range expression"),
+			("'STR ' (abc)", "Resource ID must be an integer, an integer range, or a double-quoted name"),
+			("'STR ' (1:abc)", "Resource ID must be an integer, an integer range, or a double-quoted name"),
+			("'STR ' ()", "Resource ID must be an integer, an integer range, or a double-quoted name"),
+			("'STR' (128)", "Type code must be exactly 4 bytes long"),
+			("'STR ' (130:128)", "cannot be greater than upper bound"),
+			("'STR ' (32768)", "cannot be greater than 32767"),
+		]:
+			with self.subTest(filter=filter_str):
+				with self.assertRaisesRegex(ValueError, re.escape(message)):
+					rsrcfork.__main__.ResourceFilter.from_string(filter_str)
+
+
 if __name__ == "__main__":
 	unittest.main()